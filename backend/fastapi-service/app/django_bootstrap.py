@@ -0,0 +1,33 @@
+# app/django_bootstrap.py
+import os
+import sys
+import logging
+import django
+
+logger = logging.getLogger(__name__)
+
+# --- Django Setup (Ensure Paths are Correct) ---
+CURRENT_DIR = os.path.dirname(__file__)
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..', '..'))
+DJANGO_SERVICE_DIR = os.path.join(PROJECT_ROOT, 'django-service')
+
+_initialized = False
+
+def init_django() -> None:
+    """Configures the Django ORM once per process; safe to call repeatedly."""
+    global _initialized
+    if _initialized:
+        return
+
+    if DJANGO_SERVICE_DIR not in sys.path:
+        sys.path.insert(0, DJANGO_SERVICE_DIR)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aquaguard_django.settings')
+
+    try:
+        django.setup()
+        logger.info("Django setup complete.")
+    except Exception as e:
+        logger.critical(f"FATAL: Django setup failed! Error: {e}")
+        raise
+    _initialized = True
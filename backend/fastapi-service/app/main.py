@@ -1,13 +1,29 @@
 # app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from .routers import calculations, reports, ingestion
+from .services import django_client
+from .django_bootstrap import init_django
 import uvicorn
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Set up the Django ORM once per worker instead of when the ingestion router is imported
+    init_django()
+    # One pooled aiohttp session per worker for all Django calls
+    await django_client.open_session()
+    yield
+    await django_client.close_session()
+
 app = FastAPI(
     title="AQUA-GUARD Data Processing Service",
     description="FastAPI service for heavy data processing tasks",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializes dataclasses and NumPy scalars natively and is much faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # CORS Middleware
@@ -1,18 +1,37 @@
 # routers/calculations.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from concurrent.futures import ProcessPoolExecutor
 import asyncio
-from ..services.hmpi_calculator import HPICalculator
+import numpy as np
+from ..services.hmpi_calculator import HPICalculator, get_calculator, QUALITY_THRESHOLDS, QUALITY_CATEGORIES
 
 router = APIRouter()
-calculator = HPICalculator()
+
+# Array forms of the calculator's quality thresholds/categories, for bucketing a whole batch at once
+_THRESHOLD_ARRAY = np.array(QUALITY_THRESHOLDS, dtype=np.float64)
+_CATEGORY_ARRAY = np.array(QUALITY_CATEGORIES)
+
+def safe_float(value, default=0.0):
+    """Helper function to safely convert to float"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
 
 def calculate_hmpi_batch(samples_batch):
-    """Calculate HMPI for a batch of samples in a separate process"""
-    calculator = HPICalculator()
-    results = []
+    """Calculate HMPI for a batch of samples in a separate process, vectorized across the batch"""
+    calculator = get_calculator()
+    metals = list(calculator.standards)
+    
+    # Preallocate the (samples x metals) matrix and fill only the measured columns in place;
+    # metals not in this dataset (lead, cadmium, etc.) stay at 0 since they're not measured
+    concentrations = np.zeros((len(samples_batch), len(metals)), dtype=np.float64)
+    measured_columns = [metals.index(metal) for metal in ('arsenic', 'iron', 'uranium')]
+    valid_samples = []
     failed_calculations = []
     
     for sample in samples_batch:
@@ -20,55 +39,12 @@ def calculate_hmpi_batch(samples_batch):
             # Extract metal concentrations with proper field mapping and unit conversion
             # Convert ppb to mg/L: ppb = μg/L, so ppb/1000 = mg/L
             # Convert ppm to mg/L: ppm = mg/L (for water)
-            
-            # Helper function to safely convert to float
-            def safe_float(value, default=0.0):
-                if value is None:
-                    return default
-                try:
-                    return float(value)
-                except (ValueError, TypeError):
-                    return default
-            
-            sample_dict = {
-                'arsenic': safe_float(sample.get('as_ppb', 0)) / 1000.0,  # ppb to mg/L
-                'iron': safe_float(sample.get('fe_ppm', 0)),  # ppm = mg/L for water
-                'uranium': safe_float(sample.get('u_ppb', 0)) / 1000.0,  # ppb to mg/L
-                # Note: Other metals (lead, cadmium, etc.) not available in this dataset
-                # Using 0 as default since they're not measured
-                'lead': 0,
-                'cadmium': 0,
-                'chromium': 0,
-                'mercury': 0,
-                'zinc': 0,
-                'copper': 0,
-            }
-            
-            # Calculate indices
-            hpi = calculator.calculate_hpi(sample_dict)
-            hei = calculator.calculate_hei(sample_dict)
-            cd = calculator.calculate_cd(sample_dict)
-            mi = calculator.calculate_mi(sample_dict)
-            
-            quality = calculator.classify_water_quality(hpi)
-            
-            # Include location data for map visualization
-            results.append({
-                "sample_id": sample.get('sample_id', str(sample.get('id', ''))),
-                "sample_pk": sample.get('id'),
-                "location_name": sample.get('location', 'Unknown Location'),
-                "state": sample.get('state', None),
-                "district": sample.get('district', None),
-                "latitude": sample.get('latitude', None),
-                "longitude": sample.get('longitude', None),
-                "hpi_value": hpi,
-                "hei_value": hei,
-                "cd_value": cd,
-                "mi_value": mi,
-                "quality_category": quality,
-                "calculation_method": "WHO_2011",
-                "notes": f"Parallel calculation using {len([k for k, v in sample_dict.items() if v])} metals"
-            })
+            concentrations[len(valid_samples), measured_columns] = (
+                safe_float(sample.get('as_ppb', 0)) / 1000.0,  # arsenic, ppb to mg/L
+                safe_float(sample.get('fe_ppm', 0)),  # iron, ppm = mg/L for water
+                safe_float(sample.get('u_ppb', 0)) / 1000.0,  # uranium, ppb to mg/L
+            )
+            valid_samples.append(sample)
             
         except Exception as e:
             failed_calculations.append({
@@ -76,6 +52,42 @@ def calculate_hmpi_batch(samples_batch):
                 "error": str(e)
             })
     
+    if not valid_samples:
+        return [], failed_calculations
+    
+    # Calculate indices for the whole batch at once (rows = samples, columns = metals);
+    # slicing off the rows of failed samples is a view, not a copy
+    concentrations = concentrations[:len(valid_samples)]
+    hpi_values = calculator.calculate_hpi_batch(concentrations)
+    hei_values = calculator.calculate_hei_batch(concentrations)
+    cd_values = calculator.calculate_cd_batch(concentrations)
+    mi_values = hei_values  # Same formula as HEI
+    qualities = _CATEGORY_ARRAY[np.searchsorted(_THRESHOLD_ARRAY, hpi_values, side='right')]
+    metals_used = np.count_nonzero(concentrations, axis=1)
+    
+    # Include location data for map visualization
+    results = []
+    for sample, hpi, hei, cd, mi, quality, n_metals in zip(
+        valid_samples, hpi_values.tolist(), hei_values.tolist(), cd_values.tolist(),
+        mi_values.tolist(), qualities.tolist(), metals_used.tolist()
+    ):
+        results.append({
+            "sample_id": sample.get('sample_id', str(sample.get('id', ''))),
+            "sample_pk": sample.get('id'),
+            "location_name": sample.get('location', 'Unknown Location'),
+            "state": sample.get('state', None),
+            "district": sample.get('district', None),
+            "latitude": sample.get('latitude', None),
+            "longitude": sample.get('longitude', None),
+            "hpi_value": hpi,
+            "hei_value": hei,
+            "cd_value": cd,
+            "mi_value": mi,
+            "quality_category": quality,
+            "calculation_method": "WHO_2011",
+            "notes": f"Parallel calculation using {n_metals} metals"
+        })
+    
     return results, failed_calculations
 
 class SampleData(BaseModel):
@@ -114,18 +126,19 @@ class CalculationResponse(BaseModel):
     notes: str = ""
 
 @router.post("/single", response_model=CalculationResponse)
-async def calculate_single_sample(sample: SampleData):
+async def calculate_single_sample(sample: SampleData, calculator: HPICalculator = Depends(get_calculator)):
     """Calculate indices for a single water sample"""
     
     try:
         # Convert sample to dict for calculation
         sample_dict = sample.dict()
         
-        # Calculate all indices
-        hpi_value = calculator.calculate_hpi(sample_dict)
-        hei_value = calculator.calculate_hei(sample_dict)
-        cd_value = calculator.calculate_cd(sample_dict)
-        mi_value = calculator.calculate_mi(sample_dict)
+        # Calculate all indices in one pass
+        indices = calculator.calculate_all_indices(sample_dict)
+        hpi_value = indices["hpi"]
+        hei_value = indices["hei"]
+        cd_value = indices["cd"]
+        mi_value = indices["mi"]
         quality = calculator.categorize_water_quality(hpi_value)
         
         return CalculationResponse(
@@ -143,41 +156,34 @@ async def calculate_single_sample(sample: SampleData):
         raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
 
 @router.post("/batch")
-async def calculate_batch_samples(request: BatchCalculationRequest):
+async def calculate_batch_samples(request: BatchCalculationRequest, calculator: HPICalculator = Depends(get_calculator)):
     """Calculate indices for multiple water samples"""
     
     try:
         results = []
         failed_calculations = []
         
-        for sample in request.samples:
-            try:
-                # Convert sample to dict for calculation
-                sample_dict = sample.dict()
-                
-                # Calculate all indices
-                hpi_value = calculator.calculate_hpi(sample_dict)
-                hei_value = calculator.calculate_hei(sample_dict)
-                cd_value = calculator.calculate_cd(sample_dict)
-                mi_value = calculator.calculate_mi(sample_dict)
-                quality = calculator.categorize_water_quality(hpi_value)
-                
-                results.append({
-                    "sample_id": sample.sample_id,
-                    "hpi_value": round(hpi_value, 4),
-                    "hei_value": round(hei_value, 4) if hei_value else None,
-                    "cd_value": round(cd_value, 4) if cd_value else None,
-                    "mi_value": round(mi_value, 4) if mi_value else None,
-                    "quality_category": quality,
-                    "calculation_method": "WHO_2011",
-                    "notes": f"Calculated using {len([k for k, v in sample_dict.items() if v and k != 'sample_id'])} metals"
-                })
-                
-            except Exception as e:
-                failed_calculations.append({
-                    "sample_id": sample.sample_id,
-                    "error": str(e)
-                })
+        # Convert samples to dicts and calculate all indices for the whole batch at once
+        sample_dicts = [sample.dict() for sample in request.samples]
+        batch = calculator.sample_batch(sample_dicts)
+        hpi_values = calculator.calculate_hpi_batch(batch)
+        hei_values = calculator.calculate_hei_batch(batch)
+        cd_values = calculator.calculate_cd_batch(batch)
+        mi_values = hei_values  # Same formula as HEI
+        
+        for sample_dict, hpi_value, hei_value, cd_value, mi_value in zip(
+            sample_dicts, hpi_values.tolist(), hei_values.tolist(), cd_values.tolist(), mi_values.tolist()
+        ):
+            results.append({
+                "sample_id": sample_dict['sample_id'],
+                "hpi_value": round(hpi_value, 4),
+                "hei_value": round(hei_value, 4) if hei_value else None,
+                "cd_value": round(cd_value, 4) if cd_value else None,
+                "mi_value": round(mi_value, 4) if mi_value else None,
+                "quality_category": calculator.categorize_water_quality(hpi_value),
+                "calculation_method": "WHO_2011",
+                "notes": f"Calculated using {len([k for k, v in sample_dict.items() if v and k != 'sample_id'])} metals"
+            })
         
         return {
             "calculated_indices": results,
@@ -254,7 +260,7 @@ async def calculate_by_year(request: YearCalculationRequest):
         raise HTTPException(status_code=500, detail=f"Year-based calculation error: {str(e)}")
 
 @router.get("/standards")
-async def get_calculation_standards():
+async def get_calculation_standards(calculator: HPICalculator = Depends(get_calculator)):
     """Get the WHO standards and calculation parameters"""
     
     return {
@@ -269,3 +275,9 @@ async def get_calculation_standards():
         "calculation_method": "WHO_2011",
         "supported_metals": list(calculator.standards.keys())
     }
+
+@router.get("/cache-stats")
+async def get_cache_stats(calculator: HPICalculator = Depends(get_calculator)):
+    """Debug view of the single-sample result cache in this worker"""
+    
+    return calculator.indices_cache_info()
@@ -1,43 +1,42 @@
 import tempfile
+import io
+import shutil
 import pandas as pd
 import os
-import sys
-import django
 import logging
 import math
+import gc
+import functools
+import re
 import concurrent.futures
-import PyPDF2
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from pypdf import PdfReader
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from ..django_bootstrap import init_django
+
+# Configure logging (set HMPI_LOG_LEVEL=WARNING in production to silence per-upload chatter)
+logging.basicConfig(level=os.environ.get('HMPI_LOG_LEVEL', 'INFO').upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 try:
     import tabula
 except Exception as e: # pragma: no cover
     tabula = None
-    logging.error(f"Failed to import tabula-py: {e}")
-
-# --- Django Setup (Ensure Paths are Correct) ---
-CURRENT_DIR = os.path.dirname(__file__)
-PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..', '..', '..'))
-DJANGO_SERVICE_DIR = os.path.join(PROJECT_ROOT, 'django-service')
-
-if DJANGO_SERVICE_DIR not in sys.path:
-    sys.path.insert(0, DJANGO_SERVICE_DIR)
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aquaguard_django.settings')
+    logger.error(f"Failed to import tabula-py: {e}")
 
+# PyMuPDF is an opt-in extra (AGPL-3.0, so not in requirements): used for page counts when installed,
+# otherwise pypdf handles them
 try:
-    django.setup()
-    from data_management.models import GroundWaterSample
-    logging.info("Django setup complete.")
-except Exception as e:
-    logging.critical(f"FATAL: Django setup failed! Error: {e}")
-    raise
+    import fitz  # PyMuPDF
+except Exception: # pragma: no cover
+    fitz = None
 
 router = APIRouter()
 
@@ -46,221 +45,362 @@ class IngestionResponse(BaseModel):
     records_processed: int
     new_records_created: int
 
-# --- DEFINED COLUMN NAMES (24 core data columns needed for insertion) ---
-CORE_DATA_COLUMNS = [
-    'S.No', 'State', 'District', 'Location', 'Longitude', 'Latitude', 'Year', 
-    'pH', 'EC (µS/cm)', 'CO3 (mg/L)', 'HCO3 (mg/L)', 'Cl (mg/L)', 'F (mg/L)', 
-    'SO4 (mg/L)', 'NO3 (mg/L)', 'PO4 (mg/L)', 'Total Hardness (mg/L)', 
-    'Ca (mg/L)', 'Mg (mg/L)', 'Na (mg/L)', 'K (mg/L)', 'Fe (ppm)', 'As (ppb)', 
-    'U (ppb)'
-]
-
-def _safe_get_text(rec: dict, key: str) -> str:
-    """Safely retrieves text fields, ensuring non-string inputs (like floats) are handled."""
-    raw_value = rec.get(key)
-    if raw_value is None:
-        return ""
-    # Explicitly cast to string before cleaning, preventing AttributeError if Pandas read it as a float.
-    return str(raw_value).strip()
-
-
-def _process_pdf_page(tmp_path: str, page: int) -> list:
-    """Process a single page of a PDF file and return the extracted data frames."""
+# --- COLUMN MAPPING (24 core data columns needed for insertion) ---
+# (GroundWaterSample field, PDF table column) in the order the columns appear in the table
+FIELD_MAP = (
+    ('s_no', 'S.No'), ('state', 'State'), ('district', 'District'), ('location', 'Location'),
+    ('longitude', 'Longitude'), ('latitude', 'Latitude'), ('year', 'Year'),
+    ('ph', 'pH'), ('ec_us_cm', 'EC (µS/cm)'), ('co3_mg_l', 'CO3 (mg/L)'),
+    ('hco3_mg_l', 'HCO3 (mg/L)'), ('cl_mg_l', 'Cl (mg/L)'), ('f_mg_l', 'F (mg/L)'),
+    ('so4_mg_l', 'SO4 (mg/L)'), ('no3_mg_l', 'NO3 (mg/L)'), ('po4_mg_l', 'PO4 (mg/L)'),
+    ('total_hardness_mg_l', 'Total Hardness (mg/L)'), ('ca_mg_l', 'Ca (mg/L)'),
+    ('mg_mg_l', 'Mg (mg/L)'), ('na_mg_l', 'Na (mg/L)'), ('k_mg_l', 'K (mg/L)'),
+    ('fe_ppm', 'Fe (ppm)'), ('as_ppb', 'As (ppb)'), ('u_ppb', 'U (ppb)'),
+)
+FIELD_ORDER = tuple(field for field, _ in FIELD_MAP)
+CORE_DATA_COLUMNS = [column for _, column in FIELD_MAP]
+
+TEXT_COLUMNS = ['State', 'District', 'Location']
+NUMERIC_COLUMNS = [c for c in CORE_DATA_COLUMNS if c not in TEXT_COLUMNS and c != 'S.No']
+
+# S.Nos already known to be in the database, so re-ingesting the same dataset skips them.
+# Per-process, oldest first: S.No -> time.monotonic() when last seen. Entries older than SEEN_SNO_TTL
+# seconds are ignored and evicted, so rows deleted from the database can be ingested again.
+_seen_snos: OrderedDict[int, float] = OrderedDict()
+_seen_snos_lock = threading.Lock()
+SEEN_SNO_TTL = float(os.environ.get('HMPI_SEEN_SNO_TTL', '300'))
+SEEN_SNO_MAX = int(os.environ.get('HMPI_SEEN_SNO_MAX', '100000'))
+
+# Rows per INSERT statement, further capped by the database's parameter limit
+BULK_CREATE_BATCH_SIZE = int(os.environ.get('HMPI_BULK_BATCH', '1000'))
+
+# Batches at least this large skip the ORM and load through PostgreSQL COPY
+COPY_THRESHOLD = int(os.environ.get('HMPI_COPY_THRESHOLD', '5000'))
+
+# Thousands separators and stray spaces that tabula leaves inside numeric cells
+_NUMBER_JUNK = str.maketrans('', '', ', ')
+
+# PDFs with at most this many pages are read in a single tabula call without a process pool
+SERIAL_PAGE_LIMIT = 4
+
+_SPAWN_CONTEXT = multiprocessing.get_context("spawn")
+
+PDF_MAGIC = b'%PDF-'
+
+# Matches one entry of a page spec such as "3" or "3-5"
+_PAGE_RANGE_RE = re.compile(r'^\s*(\d+)\s*(?:-\s*(\d+))?\s*$')
+
+def _parse_pages(spec: str, total_pages: int) -> list[int]:
+    """
+    Expands a page spec like "1,3-5,7" into a sorted list of unique page numbers.
+    Ranges are clamped to 1..total_pages before expanding, so a huge range can't allocate more than the document.
+    """
+    pages = set()
+    for part in spec.split(','):
+        match = _PAGE_RANGE_RE.match(part)
+        if not match:
+            continue
+        start = max(int(match.group(1)), 1)
+        end = min(int(match.group(2) or match.group(1)), total_pages)
+        pages.update(range(start, end + 1))
+    return sorted(pages)
+
+def _format_pages(pages: list[int]) -> str:
+    """Merges sorted page numbers back into a compact spec ("1,3-5,7") that tabula accepts as-is."""
+    ranges = []
+    for page in pages:
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ','.join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def _ensure_pdf_upload(file: UploadFile) -> None:
+    """Rejects uploads that are not PDFs by peeking at the magic bytes, before anything hits disk or tabula."""
+    if file.content_type not in ("application/pdf", "application/octet-stream"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF is supported.")
+    head = file.file.read(len(PDF_MAGIC))
+    file.file.seek(0)
+    if not head:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
+    if head != PDF_MAGIC:
+        raise HTTPException(status_code=400, detail="Not a PDF")
+
+
+def _process_pdf_pages(tmp_path: str, pages: list[int]) -> list:
+    """Process a block of PDF pages with a single tabula call and return the extracted data frames."""
     if tabula is None:
         raise HTTPException(status_code=500, detail="tabula-py not available on server")
     
-    logging.info(f"Processing page {page} of PDF")
+    page_spec = _format_pages(pages)
+    logger.debug("Processing pages %s of PDF", page_spec)
     data_frames = []
     
     try:
         # Prioritize lattice mode for ruled tables
-        data_frames = tabula.read_pdf(tmp_path, pages=str(page), multiple_tables=True, lattice=True, guess=False)
+        data_frames = tabula.read_pdf(tmp_path, pages=page_spec, multiple_tables=True, lattice=True, guess=False)
     except Exception:
-        logging.warning(f"tabula lattice mode failed for page {page}. Retrying with stream mode.")
+        logger.warning(f"tabula lattice mode failed for pages {page_spec}. Retrying with stream mode.")
     
     if not data_frames:
         try:
-            data_frames = tabula.read_pdf(tmp_path, pages=str(page), multiple_tables=True, stream=True, guess=False)
+            data_frames = tabula.read_pdf(tmp_path, pages=page_spec, multiple_tables=True, stream=True, guess=False)
         except Exception as e:
-            logging.error(f"tabula stream mode also failed for page {page}: {e}")
+            logger.error(f"tabula stream mode also failed for pages {page_spec}: {e}")
             data_frames = []
     
     return data_frames
 
+def _get_max_workers(page_count: int) -> int:
+    """Sizes the extraction process pool by both CPU cores and the number of pages to read."""
+    return max(1, min(page_count, os.cpu_count() or 4))
+
 def _get_pdf_page_count(tmp_path: str) -> int:
     """Get the total number of pages in a PDF file."""
     try:
-        with open(tmp_path, 'rb') as pdf_file:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            return len(pdf_reader.pages)
+        # Keyed on mtime so a rewritten file at the same path is counted again
+        return _count_pdf_pages(tmp_path, os.path.getmtime(tmp_path))
     except Exception as e:
-        logging.error(f"Error getting PDF page count: {e}")
+        logger.error(f"Error getting PDF page count: {e}")
         return 0
 
-def _process_pdf_bytes(content: bytes, pages: str = 'all') -> tuple[int, int]:
-    """Handles file writing, parallel page processing, and database insertion."""
-    if tabula is None:
-        raise HTTPException(status_code=500, detail="tabula-py not available on server")
+@functools.lru_cache(maxsize=128)
+def _count_pdf_pages(tmp_path: str, mtime: float) -> int:
+    """Parses the PDF once per (path, mtime); bounded so one-off temp paths do not pile up."""
+    if fitz is not None:
+        # PyMuPDF only loads the xref table to answer this
+        with fitz.open(tmp_path) as doc:
+            return doc.page_count
+    with open(tmp_path, 'rb') as pdf_file:
+        # Read /Count from the page tree root instead of materializing every page object
+        return int(PdfReader(pdf_file, strict=False).trailer['/Root']['/Pages']['/Count'])
+
+def _copy_insert(df: pd.DataFrame) -> int:
+    """
+    Bulk-loads cleaned rows (columns in FIELD_ORDER) with PostgreSQL COPY.
+    Rows land in a temp table first so existing S.Nos can be skipped with ON CONFLICT.
+    Returns the number of rows actually inserted.
+    """
+    from django.db import connection, transaction
+    from data_management.models import GroundWaterSample
 
-    tmp_path = None
-    try:
-        # Write content to temp file for tabula to access
-        tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    qn = connection.ops.quote_name
+    table = qn(GroundWaterSample._meta.db_table)
+    staging = qn('gws_incoming')
+    columns = ', '.join(qn(f) for f in FIELD_ORDER)
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, header=False, index=False, na_rep='\\N')
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA")
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}, created_at, updated_at) "
+            f"SELECT {columns}, now(), now() FROM {staging} "
+            f"ON CONFLICT (s_no) DO NOTHING"
+        )
+        return cursor.rowcount
+
+def _insert_ignoring_conflicts(samples: list) -> int:
+    """
+    Inserts GroundWaterSample instances in batches, skipping S.Nos that already exist.
+    Same SQL as bulk_create(ignore_conflicts=True), but executed here so each batch's
+    cursor.rowcount can be summed. Returns the number of rows actually inserted.
+    """
+    from django.db import connection, transaction
+    from django.db.models.constants import OnConflict
+    from django.db.models.sql import InsertQuery
+    from data_management.models import GroundWaterSample
+
+    opts = GroundWaterSample._meta
+    fields = [f for f in opts.concrete_fields if f is not opts.pk]
+    batch_size = max(1, min(BULK_CREATE_BATCH_SIZE, connection.ops.bulk_batch_size(fields, samples)))
+
+    created = 0
+    # One transaction for all batches instead of a commit per INSERT
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(samples), batch_size):
+            query = InsertQuery(GroundWaterSample, on_conflict=OnConflict.IGNORE)
+            query.insert_values(fields, samples[i:i + batch_size])
+            for sql, params in query.get_compiler(connection=connection).as_sql():
+                cursor.execute(sql, params)
+                created += cursor.rowcount
+    return created
+
+def _recently_seen(s_no: int, now: float) -> bool:
+    """True if s_no was stamped by _remember_snos within the last SEEN_SNO_TTL seconds."""
+    seen_at = _seen_snos.get(s_no)
+    return seen_at is not None and now - seen_at < SEEN_SNO_TTL
+
+def _remember_snos(snos) -> None:
+    """Stamps S.Nos as seen now, then evicts expired entries and anything beyond SEEN_SNO_MAX, oldest first."""
+    now = time.monotonic()
+    with _seen_snos_lock:
+        for s_no in snos:
+            _seen_snos[s_no] = now
+            _seen_snos.move_to_end(s_no)
+        cutoff = now - SEEN_SNO_TTL
+        while _seen_snos and (len(_seen_snos) > SEEN_SNO_MAX or next(iter(_seen_snos.values())) <= cutoff):
+            _seen_snos.popitem(last=False)
+
+def _remove_temp_file(tmp_path: str) -> None:
+    """Best-effort removal of a spooled upload."""
+    if tmp_path and os.path.exists(tmp_path):
         try:
-            tmp.write(content)
-            tmp.flush()
-            tmp_path = tmp.name
-        finally:
-            tmp.close()
+            os.unlink(tmp_path)
+        except Exception:
+            pass
+
+def _spool_upload(file: UploadFile) -> str:
+    """Streams an upload into a named temp file for tabula to access and returns its path."""
+    tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    try:
+        shutil.copyfileobj(file.file, tmp)
+    except Exception:
+        tmp.close()
+        _remove_temp_file(tmp.name)
+        raise
+    tmp.close()
+    return tmp.name
+
+def _process_pdf_file(tmp_path: str, pages: str = 'all') -> tuple[int, int]:
+    """Handles parallel page processing and database insertion, then deletes the temp file."""
+    try:
+        # Django is normally set up by the app lifespan; this is a no-op then
+        init_django()
+        from django.db import connection
+        from data_management.models import GroundWaterSample
+
+        if tabula is None:
+            raise HTTPException(status_code=500, detail="tabula-py not available on server")
 
         # Determine which pages to process
+        total_pages = _get_pdf_page_count(tmp_path)
+        if total_pages == 0:
+            raise HTTPException(status_code=400, detail="Could not read the PDF page count.")
         if pages.lower() == 'all':
-            total_pages = _get_pdf_page_count(tmp_path)
             pages_to_process = list(range(1, total_pages + 1))
         else:
-            # Simple parsing for single pages or comma-separated lists
-            pages_to_process = [int(p.strip()) for p in pages.split(',') if p.strip().isdigit()]
+            pages_to_process = _parse_pages(pages, total_pages)
+            if not pages_to_process:
+                raise HTTPException(status_code=400, detail=f"No requested pages within the document's {total_pages} pages.")
         
-        logging.info(f"Starting ingestion for pages: {pages_to_process}")
+        logger.info(f"Starting ingestion for pages: {_format_pages(pages_to_process)}")
         
-        # Process pages in parallel using a ThreadPoolExecutor
         all_data_frames = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(pages_to_process), 8)) as executor:
-            future_to_page = {executor.submit(_process_pdf_page, tmp_path, page): page for page in pages_to_process}
-            for future in concurrent.futures.as_completed(future_to_page):
-                try:
-                    page_data_frames = future.result()
-                    if page_data_frames:
-                        all_data_frames.extend(page_data_frames)
-                except Exception as e:
-                    logging.error(f"Error processing page {future_to_page[future]}: {e}")
+        failed_pages = []
+        if len(pages_to_process) <= SERIAL_PAGE_LIMIT:
+            # Small documents: one tabula call in-process beats starting a JVM in every pool worker
+            all_data_frames = _process_pdf_pages(tmp_path, pages_to_process)
+        else:
+            # Process pages in parallel using a ProcessPoolExecutor. tabula runs the JVM in-process via
+            # jpype, so each worker starts its own JVM and gets one contiguous block of pages to amortize it.
+            # Workers are spawned, not forked: a fork of a process whose JVM is already running (after a
+            # small upload took the in-process path) inherits a JVM without its threads and can hang.
+            max_workers = _get_max_workers(len(pages_to_process))
+            block_size = max(1, math.ceil(len(pages_to_process) / max_workers))
+            page_blocks = [pages_to_process[i:i + block_size] for i in range(0, len(pages_to_process), block_size)]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=_SPAWN_CONTEXT) as executor:
+                futures = [executor.submit(_process_pdf_pages, tmp_path, block) for block in page_blocks]
+                # Collect in submission order so tables stay in page order
+                for block, future in zip(page_blocks, futures):
+                    try:
+                        block_data_frames = future.result()
+                        if block_data_frames:
+                            all_data_frames.extend(block_data_frames)
+                    except Exception as e:
+                        failed_pages.append((_format_pages(block), str(e)))
+        if failed_pages:
+            logger.error("Failed to process %d page blocks; first 5: %s", len(failed_pages), failed_pages[:5])
         
         if not all_data_frames:
             raise HTTPException(status_code=400, detail="No tables found in the PDF after extraction attempts.")
 
         # Combine all extracted tables
         df = pd.concat(all_data_frames, ignore_index=True)
+        # Release the per-table frames before cleaning so they don't coexist with df at peak
+        del all_data_frames
+        gc.collect()
         
         # --- Data Cleaning and Alignment ---
         
         # 1. Slice and Rename Columns (assuming 24 columns were extracted)
-        logging.info(f"Raw extracted columns: {list(df.columns)}")
-        logging.info(f"Number of columns extracted: {len(df.columns)}")
+        logger.info("Number of columns extracted: %d", len(df.columns))
         
-        # Debug: Show first row of raw data before column renaming
-        if len(df) > 0:
-            logging.info(f"Raw first row data: {df.iloc[0].to_dict()}")
-            # Show first few columns to see structure
-            logging.info(f"First 5 columns of first row: {df.iloc[0, :5].to_dict()}")
-            logging.info(f"Columns 5-10 of first row: {df.iloc[0, 5:10].to_dict() if len(df.columns) > 5 else 'N/A'}")
-            logging.info(f"Last 5 columns of first row: {df.iloc[0, -5:].to_dict() if len(df.columns) > 5 else 'N/A'}")
+        # Debug: Show raw columns and first row before column renaming
+        if len(df) > 0 and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Raw extracted columns: {list(df.columns)}")
+            logger.debug(f"Raw first row data: {df.iloc[0].to_dict()}")
         
         if len(df.columns) >= len(CORE_DATA_COLUMNS):
             df = df.iloc[:, :len(CORE_DATA_COLUMNS)]
             df.columns = CORE_DATA_COLUMNS
             df = df.iloc[1:].reset_index(drop=True) # Drop the junk header row
         else:
-            logging.error(f"Extracted fewer columns ({len(df.columns)}) than expected ({len(CORE_DATA_COLUMNS)}).")
+            logger.error(f"Extracted fewer columns ({len(df.columns)}) than expected ({len(CORE_DATA_COLUMNS)}).")
             # Instead of failing, let's see what we got
-            logging.info(f"Available columns: {list(df.columns)}")
-            logging.info(f"Sample data row: {df.iloc[0].to_dict() if len(df) > 0 else 'No data'}")
+            logger.info(f"Available columns: {list(df.columns)}")
+            logger.info(f"Sample data row: {df.iloc[0].to_dict() if len(df) > 0 else 'No data'}")
             raise HTTPException(status_code=500, detail="Inconsistent column count detected during PDF extraction.")
             
-        logging.info(f"FIXED Extraction columns: {list(df.columns)}")
-        logging.info(f"Sample row after column fixing: {df.iloc[0].to_dict() if len(df) > 0 else 'No data'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sample row after column fixing: {df.iloc[0].to_dict() if len(df) > 0 else 'No data'}")
 
         # 2. General cleaning and NaN replacement
         df.dropna(how='all', inplace=True)
         df.replace(['-', 'ND', 'LOR', ''], pd.NA, inplace=True) 
         
-        # 3. Drop rows where S.No (mandatory field) is non-numeric/missing
-        df = df[pd.to_numeric(df['S.No'], errors='coerce').notna()]
+        # 3. Convert S.No once and drop rows where it (mandatory field) is non-numeric/missing
+        df['S.No'] = pd.to_numeric(df['S.No'].astype('string').str.translate(_NUMBER_JUNK), errors='coerce')
+        df = df.dropna(subset=['S.No'])
         
-        logging.info(f"Total data rows to process: {len(df)}")
-
-
-        records = df.to_dict('records')
-        samples = []
-        processed = 0
-        
-        def get_numeric(rec: dict, keys: list[str]):
-            """Robustly fetches numeric data as Python float or None."""
-            for k in keys:
-                if k in rec and rec.get(k) is not None:
-                    # Robust cleaning of spaces/commas before conversion
-                    val_str = str(rec.get(k)).strip().replace(',', '').replace(' ', '')
-                    if val_str and val_str.lower() not in ['na', 'n/a', 'null', 'none', '-']:
-                        val = pd.to_numeric(val_str, errors='coerce') 
-                        if pd.notna(val):
-                            return float(val) # Return Python float, not NumPy type
-            return None # Return None for compatibility with Django DecimalField
-
-        for idx, rec in enumerate(records):
-            processed += 1
-            s_no_val = None
-            lon_val = None
-            lat_val = None
-            
-            # Debug: Print first few records to see what data we're getting
-            if idx < 3:
-                logging.info(f"Sample record {idx}: {rec}")
-            
-            try:
-                # --- MANDATORY FIELD VALIDATION ---
-                s_no_val = get_numeric(rec, ['S.No']) 
-                lon_val = get_numeric(rec, ['Longitude'])
-                lat_val = get_numeric(rec, ['Latitude'])
-
-                if s_no_val is None or lon_val is None or lat_val is None:
-                    # Logging raw string data to see why conversion failed
-                    s_no_raw = str(rec.get('S.No'))
-                    lon_raw = str(rec.get('Longitude'))
-                    lat_raw = str(rec.get('Latitude'))
-
-                    logging.warning(
-                        f"Skipping record {idx} due to missing required field. "
-                        f"(S.No_raw: {s_no_raw!r}, Lon_raw: {lon_raw!r}, Lat_raw: {lat_raw!r})"
-                    )
-                    continue
-                
-                s_no_int = int(s_no_val)
-                year_val = get_numeric(rec, ['Year'])
-                year_int = int(year_val) if year_val is not None else 0
-
-                # --- MODEL INSTANTIATION ---
-                sample = GroundWaterSample(
-                    s_no=s_no_int,
-                    # Use _safe_get_text for string fields to prevent float crash
-                    state=_safe_get_text(rec, 'State'),
-                    district=_safe_get_text(rec, 'District'),
-                    location=_safe_get_text(rec, 'Location'), 
-                    longitude=lon_val, 
-                    latitude=lat_val,
-                    year=year_int,
-                    
-                    # Core and Heavy Metals - Using flexible column matching
-                    ph=get_numeric(rec, [find_column(['pH', 'ph', 'PH'])]),
-                    ec_us_cm=get_numeric(rec, [find_column(['EC (µS/cm at 25 °C)', 'EC (µS/cm)', 'EC', 'ec'])]),
-                    co3_mg_l=get_numeric(rec, [find_column(['CO3 (mg/L)', 'CO3', 'co3'])]),
-                    hco3_mg_l=get_numeric(rec, [find_column(['HCO3 (mg/L)', 'HCO3', 'hco3'])]),
-                    cl_mg_l=get_numeric(rec, [find_column(['Cl (mg/L)', 'Cl', 'cl'])]),
-                    f_mg_l=get_numeric(rec, [find_column(['F (mg/L)', 'F', 'f'])]),
-                    total_hardness_mg_l=get_numeric(rec, [find_column(['Total Hardness (mg/L)', 'Total Hardness', 'hardness'])]),
-                    so4_mg_l=get_numeric(rec, [find_column(['SO4 (mg/L)', 'SO4', 'so4'])]),
-                    no3_mg_l=get_numeric(rec, [find_column(['NO3 (mg/L)', 'NO3', 'no3'])]),
-                    po4_mg_l=get_numeric(rec, [find_column(['PO4 (mg/L)', 'PO4', 'po4'])]),
-                    ca_mg_l=get_numeric(rec, [find_column(['Ca (mg/L)', 'Ca', 'ca'])]),
-                    mg_mg_l=get_numeric(rec, [find_column(['Mg (mg/L)', 'Mg', 'mg'])]),
-                    na_mg_l=get_numeric(rec, [find_column(['Na (mg/L)', 'Na', 'na'])]),
-                    k_mg_l=get_numeric(rec, [find_column(['K (mg/L)', 'K', 'k'])]),
-                    fe_ppm=get_numeric(rec, [find_column(['Fe (ppm)', 'Fe', 'fe'])]),
-                    as_ppb=get_numeric(rec, [find_column(['As (ppb)', 'As', 'as'])]),
-                    u_ppb=get_numeric(rec, [find_column(['U (ppb)', 'U', 'u'])]),
-                )
-                samples.append(sample)
-            except Exception as e:
-                logging.warning(f"Failed to process record idx={idx} (S.No={s_no_val}, Lon={lon_val}): {e}", exc_info=False)
-                continue
+        logger.info(f"Total data rows to process: {len(df)}")
+
+
+        processed = len(df)
+
+        # 4. Parse every remaining column once so each row maps straight onto the model fields
+        for col in NUMERIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col].astype('string').str.translate(_NUMBER_JUNK), errors='coerce')
+        for col in TEXT_COLUMNS:
+            # Missing cells become "" rather than "nan"/"None"
+            df[col] = df[col].astype('string').str.strip().fillna('')
+
+        # --- MANDATORY FIELD VALIDATION ---
+        missing_required = df[['Longitude', 'Latitude']].isna().any(axis=1)
+        if missing_required.any():
+            logger.warning(
+                f"Skipping {int(missing_required.sum())} records due to missing required field. "
+                f"(S.Nos: {df.loc[missing_required, 'S.No'].head().tolist()})"
+            )
+            df = df.dropna(subset=['Longitude', 'Latitude'])
+
+        # Whole-column casts with explicit widths rather than the platform-dependent `int`
+        df['S.No'] = df['S.No'].astype('int64')
+        df['Year'] = df['Year'].fillna(0).astype('int32')
+        # Django DecimalFields expect None rather than NaN for missing values
+        df = df.astype(object).where(df.notna(), None)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Sample records: {df.head(3).to_dict('records')}")
+
+        # Large batches on PostgreSQL bypass model construction and bulk_create entirely
+        if connection.vendor == 'postgresql' and len(df) >= COPY_THRESHOLD:
+            df = df.drop_duplicates(subset='S.No')
+            created_count = _copy_insert(df)
+            _remember_snos(df['S.No'])
+            logger.info(f"Successfully created {created_count} records via COPY. Processed total of {processed} records. Skipped duplicates: {len(df) - created_count}")
+            return processed, created_count
+
+        # --- MODEL INSTANTIATION ---
+        samples = [
+            GroundWaterSample(**dict(zip(FIELD_ORDER, row)))
+            for row in df.itertuples(index=False, name=None)
+        ]
+        del df
+        gc.collect()
 
         # --- DEDUPLICATION AND INSERTION ---
         to_insert = []
@@ -270,38 +410,38 @@ def _process_pdf_bytes(content: bytes, pages: str = 'all') -> tuple[int, int]:
                 incoming_snos.add(s.s_no)
                 to_insert.append(s)
 
-        # Check against database for existing records
+        if not to_insert:
+            logger.warning(f"No valid records to insert. Processed total of {processed} records.")
+            return processed, 0
+
+        # S.Nos this process already ingested are skipped without touching the database
         current_batch_snos = [s.s_no for s in to_insert]
-        existing_snos = set(GroundWaterSample.objects.filter(s_no__in=current_batch_snos).values_list('s_no', flat=True))
-        
-        final_insert_list = [s for s in to_insert if s.s_no not in existing_snos]
-        
-        logging.info(f"Incoming unique S.Nos: {len(to_insert)}. Existing S.Nos found in DB: {len(existing_snos)}. Final list to insert: {len(final_insert_list)}")
-        if existing_snos:
-            logging.warning(f"Skipped S.Nos because they already exist: {list(existing_snos)[:5]}...")
-        
-        created = GroundWaterSample.objects.bulk_create(final_insert_list, ignore_conflicts=True)
+        now = time.monotonic()
+        final_insert_list = [s for s in to_insert if not _recently_seen(s.s_no, now)]
+
+        logger.info(f"Incoming unique S.Nos: {len(to_insert)}. Ingested within the last {SEEN_SNO_TTL:g}s: {len(to_insert) - len(final_insert_list)}. Final list to insert: {len(final_insert_list)}")
+
+        # The unique s_no constraint resolves collisions in the database; the created count is the
+        # inserts' own rowcount, so rows that already existed (or another upload landed first) are skipped
+        created_count = _insert_ignoring_conflicts(final_insert_list) if final_insert_list else 0
+        _remember_snos(current_batch_snos)
         
-        skipped_duplicates = len(to_insert) - len(final_insert_list)
-        logging.info(f"Successfully created {len(created)} records. Processed total of {processed} records. Skipped duplicates: {skipped_duplicates}")
+        skipped_duplicates = len(to_insert) - created_count
+        logger.info(f"Successfully created {created_count} records. Processed total of {processed} records. Skipped duplicates: {skipped_duplicates}")
         
-        return processed, len(created)
+        return processed, created_count
 
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
+        _remove_temp_file(tmp_path)
 
 
 @router.post("/convert_and_ingest", response_model=IngestionResponse)
 async def convert_and_ingest_pdf(file: UploadFile = File(...), pages: str = '1'):
-    if file.content_type not in ("application/pdf", "application/octet-stream"):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF is supported.")
+    _ensure_pdf_upload(file)
     try:
-        content = await file.read()
-        processed, created = await run_in_threadpool(_process_pdf_bytes, content, pages)
+        tmp_path = await run_in_threadpool(_spool_upload, file)
+        # _process_pdf_file removes tmp_path when it finishes
+        processed, created = await run_in_threadpool(_process_pdf_file, tmp_path, pages)
         return IngestionResponse(
             message="PDF data successfully converted and ingested.",
             records_processed=processed,
@@ -310,30 +450,29 @@ async def convert_and_ingest_pdf(file: UploadFile = File(...), pages: str = '1')
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"API endpoint caught ingestion error: {e}", exc_info=True)
+        logger.error(f"API endpoint caught ingestion error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ingestion error: {e}")
 
 
 @router.post("/convert_and_ingest_async", status_code=202)
 async def convert_and_ingest_pdf_async(background: BackgroundTasks, file: UploadFile = File(...), pages: str = 'all'):
-    if file.content_type not in ("application/pdf", "application/octet-stream"):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF is supported.")
+    _ensure_pdf_upload(file)
     
     try:
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
+        # Spool to disk so the 202 goes out without holding the whole PDF in memory
+        tmp_path = await run_in_threadpool(_spool_upload, file)
         
-        def process_pdf_in_thread(content, pages):
+        def process_pdf_in_thread(tmp_path, pages):
+            # _process_pdf_file removes tmp_path when it finishes
             try:
-                processed, created = _process_pdf_bytes(content, pages)
-                logging.info(f"Background task completed: Processed {processed} records, created {created} new entries in Django database.")
+                processed, created = _process_pdf_file(tmp_path, pages)
+                logger.info(f"Background task completed: Processed {processed} records, created {created} new entries in Django database.")
                 return processed, created
             except Exception as e:
-                logging.error(f"Background task failed: {str(e)}", exc_info=True)
+                logger.error(f"Background task failed: {str(e)}", exc_info=True)
                 return 0, 0
         
-        background.add_task(process_pdf_in_thread, content, pages)
+        background.add_task(process_pdf_in_thread, tmp_path, pages)
         
         return {
             "status": "accepted", 
@@ -345,5 +484,5 @@ async def convert_and_ingest_pdf_async(background: BackgroundTasks, file: Upload
         raise
     except Exception as e:
         error_message = f"Error preparing PDF ingestion: {str(e)}"
-        logging.error(error_message, exc_info=True)
+        logger.error(error_message, exc_info=True)
         raise HTTPException(status_code=500, detail=error_message)
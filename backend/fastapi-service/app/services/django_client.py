@@ -1,24 +1,44 @@
 # services/django_client.py
-import requests
 import asyncio
+import itertools
+import math
 import aiohttp
 from typing import List, Dict, Optional
-from datetime import datetime
 
 DJANGO_BASE_URL = "http://localhost:8000"
 
+# Paged sample fetches: at most this many requests in flight, and never past MAX_PAGES
+CONCURRENT_PAGE_FETCHES = 8
+MAX_PAGES = 200
+
+# Shared, pooled session for every Django call; opened and closed by the app lifespan
+_session: Optional[aiohttp.ClientSession] = None
+
+async def open_session() -> aiohttp.ClientSession:
+    """Get or create the shared aiohttp session"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+        )
+    return _session
+
+async def close_session():
+    """Close the shared aiohttp session"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
 class DjangoClient:
     """Client for communicating with Django service"""
     
     def __init__(self):
         self.base_url = DJANGO_BASE_URL
-        self.session = None
     
     async def get_session(self):
-        """Get or create aiohttp session"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
-        return self.session
+        """Get the shared aiohttp session"""
+        return await open_session()
     
     async def fetch_page_async(self, endpoint: str, year: int, page: int):
         """Fetch a single page asynchronously"""
@@ -54,103 +74,65 @@ class DjangoClient:
         try:
             endpoint = "/api/v1/ground-water-samples/" if sample_type == "ground_water" else "/api/v1/samples/"
             
-            # Start with first page
-            all_samples = []
-            page = 1
-            consecutive_failures = 0
-            max_consecutive_failures = 3  # Stop after 3 consecutive failures
+            semaphore = asyncio.Semaphore(CONCURRENT_PAGE_FETCHES)
             
-            # Keep fetching pages until we hit consecutive failures
-            while consecutive_failures < max_consecutive_failures:
-                result = await self.fetch_page_async(endpoint, year, page)
-                
-                if result and 'results' in result and result['results']:
-                    # Success - add samples and reset failure counter
-                    all_samples.extend(result['results'])
-                    consecutive_failures = 0
-                    print(f"✓ Page {page}: {len(result['results'])} samples")
-                elif result and 'results' in result and not result['results']:
-                    # Empty page - we've reached the end
-                    print(f"✓ Page {page}: Empty page - reached end of data")
-                    break
-                else:
-                    # Failed page - increment failure counter but continue
-                    consecutive_failures += 1
-                    print(f"✗ Page {page}: Failed (consecutive failures: {consecutive_failures})")
-                    
-                    # If this is a single failure, continue to next page
-                    if consecutive_failures < max_consecutive_failures:
-                        print(f"  Continuing to page {page + 1}...")
-                
-                page += 1
-                
-                # Safety limit to prevent infinite loops
-                if page > 200:  # Max 200 pages (20,000 records)
-                    print("Safety limit reached - stopping at page 200")
-                    break
+            async def fetch(page):
+                async with semaphore:
+                    return await self.fetch_page_async(endpoint, year, page)
             
-            print(f"Final result: {len(all_samples)} samples collected from {page-1} page attempts")
+            def has_results(result):
+                return isinstance(result, dict) and bool(result.get('results'))
             
-            samples = all_samples
+            # The first page tells us the page size and, with DRF pagination, the total count
+            first_page = await fetch(1)
+            page_results = [first_page]
+            total_count = first_page.get('count') if has_results(first_page) else None
             
-            # Filter by year if the API doesn't support year filtering (additional safety check)
-            if isinstance(samples, list):
-                year_filtered = []
-                for sample in samples:
-                    sample_year = None
-                    
-                    # Check if there's a direct year field first
-                    if isinstance(sample, dict) and 'year' in sample:
-                        sample_year = sample['year']
-                    else:
-                        # Try different date fields that might exist
-                        date_fields = ['collection_date', 'date_collected', 'created_at', 'date']
-                        
-                        for field in date_fields:
-                            if isinstance(sample, dict) and field in sample and sample[field]:
-                                try:
-                                    date_str = str(sample[field])
-                                    if date_str:
-                                        sample_year = datetime.fromisoformat(date_str.replace('Z', '+00:00')).year
-                                        break
-                                except:
-                                    continue
-                    
-                    if sample_year == year:
-                        year_filtered.append(sample)
-                
-                return year_filtered
+            if total_count:
+                # Known page count - fetch every remaining page concurrently
+                last_page = min(math.ceil(total_count / len(first_page['results'])), MAX_PAGES)
+                page_results += await asyncio.gather(*(fetch(page) for page in range(2, last_page + 1)))
+            elif first_page is None or has_results(first_page):
+                # Page 1 failed or carried no count - scan in windows until a whole window comes back empty or failed
+                page = 2
+                while page <= MAX_PAGES:
+                    window = range(page, min(page + CONCURRENT_PAGE_FETCHES, MAX_PAGES + 1))
+                    window_results = await asyncio.gather(*(fetch(p) for p in window))
+                    page_results += window_results
+                    if not any(has_results(result) for result in window_results):
+                        break
+                    page += CONCURRENT_PAGE_FETCHES
+            
+            all_samples = list(itertools.chain.from_iterable(
+                result['results'] for result in page_results if has_results(result)
+            ))
+            print(f"Final result: {len(all_samples)} samples collected from {len(page_results)} page requests")
             
-            return samples
+            # Django filters by ?year= (filterset_fields on the viewset), so no client-side re-filter
+            return all_samples
                 
         except Exception as e:
             raise Exception(f"Error fetching samples by year: {str(e)}")
-        finally:
-            # Close the aiohttp session if it exists
-            if self.session:
-                await self.session.close()
-                self.session = None
     
     async def check_existing_calculations(self, year: int, location_name: str, latitude: float, longitude: float):
         """
         Check if calculations already exist for a specific year and location
         """
+        session = await self.get_session()
         try:
-            response = requests.get(
+            async with session.get(
                 f"{self.base_url}/api/v1/computed-indices/",
                 params={
                     "calculation_year": year,
                     "location_name": location_name,
                     "latitude": latitude,
                     "longitude": longitude
-                },
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get('results', data) if isinstance(data, dict) else data
-                return len(results) > 0  # True if calculations exist
+                }
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    results = data.get('results', data) if isinstance(data, dict) else data
+                    return len(results) > 0  # True if calculations exist
             
             return False
             
@@ -161,18 +143,17 @@ class DjangoClient:
 async def send_to_django(sample_data: List[Dict]):
     """Send processed data to Django service"""
     
+    session = await open_session()
     try:
         # In production, you'd handle authentication properly
-        response = requests.post(
+        async with session.post(
             f"{DJANGO_BASE_URL}/api/v1/samples/",
-            json={"bulk_data": sample_data},
-            headers={"Content-Type": "application/json"}
-        )
-        
-        return {
-            "status": "success" if response.status_code == 201 else "error",
-            "django_response": response.status_code
-        }
+            json={"bulk_data": sample_data}
+        ) as response:
+            return {
+                "status": "success" if response.status == 201 else "error",
+                "django_response": response.status
+            }
         
     except Exception as e:
         return {
@@ -183,22 +164,19 @@ async def send_to_django(sample_data: List[Dict]):
 async def get_from_django(endpoint: str):
     """Get data from Django service"""
     
+    session = await open_session()
     try:
-        response = requests.get(
-            f"{DJANGO_BASE_URL}{endpoint}",
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code == 200:
-            return {
-                "status": "success",
-                "data": response.json()
-            }
-        else:
-            return {
-                "status": "error",
-                "message": f"Django service returned {response.status_code}"
-            }
+        async with session.get(f"{DJANGO_BASE_URL}{endpoint}") as response:
+            if response.status == 200:
+                return {
+                    "status": "success",
+                    "data": await response.json()
+                }
+            else:
+                return {
+                    "status": "error",
+                    "message": f"Django service returned {response.status}"
+                }
         
     except Exception as e:
         return {
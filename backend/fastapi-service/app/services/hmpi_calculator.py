@@ -1,25 +1,196 @@
+import bisect
+import functools
+import math
 import numpy as np
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import ClassVar, Dict, List
+
+try:
+    from numba import njit
+except ImportError: # pragma: no cover
+    njit = None
+
+# Per-sample kernels over a concentration vector (NaN = metal not measured). Compiled with numba
+# when it is installed; otherwise the methods below fall back to masked NumPy operations.
+# fastmath is left off because it would let the compiler assume the NaN checks never fire.
+# Since Wi = 1/Si, every Ci/Si is computed as Ci × Wi: a multiply instead of a divide per metal.
+_hpi_kernel = _hei_kernel = _cd_kernel = _all_kernel = None
+
+if njit is not None:
+    @njit(cache=True)
+    def _hpi_kernel(c, wi):
+        total_weighted = 0.0
+        total_weights = 0.0
+        for i in range(c.shape[0]):
+            if not math.isnan(c[i]):
+                total_weighted += wi[i] * (c[i] * wi[i]) * 100.0
+                total_weights += wi[i]
+        return total_weighted / total_weights if total_weights > 0 else 0.0
+
+    @njit(cache=True)
+    def _hei_kernel(c, wi):
+        sum_ratio = 0.0
+        count = 0
+        for i in range(c.shape[0]):
+            if not math.isnan(c[i]):
+                sum_ratio += c[i] * wi[i]
+                count += 1
+        return sum_ratio / count if count > 0 else 0.0
+
+    @njit(cache=True)
+    def _cd_kernel(c, wi):
+        cd_sum = 0.0
+        for i in range(c.shape[0]):
+            if not math.isnan(c[i]):
+                cd_sum += c[i] * wi[i] - 1.0
+        return cd_sum
+
+    @njit(cache=True)
+    def _all_kernel(c, wi):
+        total_weighted = 0.0
+        total_weights = 0.0
+        sum_ratio = 0.0
+        count = 0
+        for i in range(c.shape[0]):
+            if not math.isnan(c[i]):
+                ratio = c[i] * wi[i]
+                total_weighted += wi[i] * ratio * 100.0
+                total_weights += wi[i]
+                sum_ratio += ratio
+                count += 1
+        hpi = total_weighted / total_weights if total_weights > 0 else 0.0
+        hei = sum_ratio / count if count > 0 else 0.0
+        return hpi, hei, sum_ratio - count
+
+    # Compile (or load from the on-disk cache) at import rather than on the first request
+    _warmup = np.array([0.01, np.nan])
+    _hpi_kernel(_warmup, _warmup)
+    _hei_kernel(_warmup, _warmup)
+    _cd_kernel(_warmup, _warmup)
+    _all_kernel(_warmup, _warmup)
+
+# Water quality categories; string literals are interned, so these are returned without allocating
+EXCELLENT = "excellent"
+GOOD = "good"
+MODERATE = "moderate"
+POOR = "poor"
+
+# HPI category boundaries; a value on a boundary falls in the worse category
+QUALITY_THRESHOLDS = (25, 50, 100)
+QUALITY_CATEGORIES = (EXCELLENT, GOOD, MODERATE, POOR)
+
+# Everything in a pollution status except the HPI value itself
+_STATUS_TEMPLATES = {
+    EXCELLENT: {"category": EXCELLENT, "description": "Very low heavy metal pollution level", "risk_level": "Minimal"},
+    GOOD: {"category": GOOD, "description": "Low heavy metal pollution level", "risk_level": "Low"},
+    MODERATE: {"category": MODERATE, "description": "Moderate heavy metal pollution level", "risk_level": "Moderate"},
+    POOR: {"category": POOR, "description": "High heavy metal pollution level", "risk_level": "High"},
+}
+
+@dataclass(slots=True, frozen=True)
+class PollutionStatus:
+    """Detailed pollution status for an HPI value; immutable, so one instance can serve many samples"""
+    hpi_value: float
+    category: str
+    description: str
+    risk_level: str
+
+@functools.lru_cache(maxsize=2048)
+def _pollution_status(hpi_rounded: float, category: str) -> PollutionStatus:
+    """Status for HPICalculator.get_pollution_status, shared across samples with the same rounded HPI"""
+    return PollutionStatus(hpi_value=hpi_rounded, **_STATUS_TEMPLATES[category])
+
+class SampleBatch:
+    """
+    Structure-of-arrays view of many samples: an (N samples × M metals) concentration matrix
+    with one contiguous row per sample, plus the mask of metals actually measured
+    """
+    __slots__ = ("metals", "matrix", "mask")
+
+    def __init__(self, metals: tuple, matrix: np.ndarray, mask: np.ndarray = None):
+        self.metals = metals
+        self.matrix = np.ascontiguousarray(matrix)
+        self.mask = ~np.isnan(self.matrix) if mask is None else mask
+
+    @classmethod
+    def from_samples(cls, samples: List[Dict], metals: tuple, dtype=np.float64) -> "SampleBatch":
+        """Builds the batch from sample dicts; missing or None concentrations become NaN"""
+        matrix = np.full((len(samples), len(metals)), np.nan, dtype=dtype)
+        for i, sample in enumerate(samples):
+            get = sample.get
+            for j, metal in enumerate(metals):
+                c = get(metal)
+                if c is not None:
+                    matrix[i, j] = c
+        return cls(metals, matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
 
 class HPICalculator:
+    # WHO/BIS Standard permissible limits (mg/L)
+    _STANDARDS: ClassVar[Dict[str, float]] = {
+        'arsenic': 0.01,      # WHO guideline
+        'lead': 0.01,         # WHO guideline
+        'cadmium': 0.003,     # WHO guideline
+        'chromium': 0.05,     # WHO guideline
+        'mercury': 0.001,     # WHO guideline
+        'iron': 0.3,          # WHO guideline
+        'zinc': 3.0,          # WHO guideline
+        'copper': 2.0,        # WHO guideline
+        'uranium': 0.03,      # WHO guideline
+    }
+
+    # Array views of the standards in a fixed metal order, for the vectorized calculations;
+    # built once per process with the class rather than per instance
+    _metals: ClassVar[tuple] = tuple(_STANDARDS)
+    _std: ClassVar[np.ndarray] = np.array(list(_STANDARDS.values()), dtype=np.float64)
+    _wi: ClassVar[np.ndarray] = 1.0 / _std
+    _wi_f32: ClassVar[np.ndarray] = _wi.astype(np.float32)
+
+    @functools.cached_property
+    def standards(self) -> Dict[str, float]:
+        """Permissible limits per metal; a per-instance copy so callers can't alter the class table"""
+        return dict(self._STANDARDS)
+
+    @functools.cached_property
+    def ideal_values(self) -> Dict[str, float]:
+        """
+        Ideal values (Ii) are 0 for every metal, which is why Qi reduces to (Ci/Si) × 100;
+        kept for callers such as /calculations/standards that report them
+        """
+        return {metal: 0 for metal in self._STANDARDS}
+
+    @functools.cached_property
+    def unit_weights(self) -> Dict[str, float]:
+        """Unit weights (Wi = K/Si, where K=1)"""
+        return dict(zip(self._metals, self._wi.tolist()))
+
     def __init__(self):
-        # WHO/BIS Standard permissible limits (mg/L)
-        self.standards = {
-            'arsenic': 0.01,      # WHO guideline
-            'lead': 0.01,         # WHO guideline
-            'cadmium': 0.003,     # WHO guideline
-            'chromium': 0.05,     # WHO guideline
-            'mercury': 0.001,     # WHO guideline
-            'iron': 0.3,          # WHO guideline
-            'zinc': 3.0,          # WHO guideline
-            'copper': 2.0,        # WHO guideline
-            'uranium': 0.03,      # WHO guideline
-        }
-        
-        # Unit weights (Wi = K/Si, where K=1)
-        self.unit_weights = {}
-        for metal, standard in self.standards.items():
-            self.unit_weights[metal] = 1 / standard
+        # HPI = Σ(Wi × Ci/Si × 100) / ΣWi folds into Σ(αi × Ci) with αi = 100·Wi / (Si·ΣWi), where ΣWi
+        # runs over the metals present; α per presence pattern (at most 2^M of them), keyed by mask bytes
+        self._alpha_cache: Dict[bytes, np.ndarray] = {}
+        self._alpha_full = self._alpha_for(np.ones(len(self._metals), dtype=bool))
+
+        # Single-sample results keyed by the exact concentrations, so re-submitted samples are free
+        self._indices_for = functools.lru_cache(maxsize=4096)(self._compute_all_indices)
+
+    def _concentrations(self, sample_data: Dict) -> np.ndarray:
+        """Concentrations in self._metals order, NaN where a metal is missing or None"""
+        get = sample_data.get  # one bound-method lookup, one hash per metal
+        return np.fromiter(
+            (np.nan if (c := get(m)) is None else c for m in self._metals),
+            dtype=np.float64, count=len(self._metals)
+        )
+
+    def _alpha_for(self, mask: np.ndarray) -> np.ndarray:
+        """HPI coefficients for the metals selected by mask, in self._metals order"""
+        key = mask.tobytes()
+        alpha = self._alpha_cache.get(key)
+        if alpha is None:
+            wi = self._wi[mask]
+            alpha = self._alpha_cache[key] = 100 * wi * wi / wi.sum()  # Wi/Si = Wi² since Wi = 1/Si
+        return alpha
 
     def calculate_hpi(self, sample_data: Dict) -> float:
         """
@@ -27,21 +198,16 @@ class HPICalculator:
         HPI = Σ(Wi × Qi) / ΣWi
         Where: Qi = (Si/Standard) × 100 (NOT using ideal values)
         """
-        total_weighted = 0
-        total_weights = 0
+        c = self._concentrations(sample_data)
+        if _hpi_kernel is not None:
+            return _hpi_kernel(c, self._wi)
+        mask = ~np.isnan(c)
+        if mask.all():
+            return float(np.dot(self._alpha_full, c))
+        if not mask.any():
+            return 0
         
-        for metal, concentration in sample_data.items():
-            if metal in self.standards and concentration is not None:
-                # Unit weight (Wi = 1/Standard)
-                wi = self.unit_weights[metal]
-                
-                # Sub-index (Qi = (Measured/Standard) × 100)
-                qi = (concentration / self.standards[metal]) * 100
-                
-                total_weighted += wi * qi
-                total_weights += wi
-        
-        return total_weighted / total_weights if total_weights > 0 else 0
+        return float(np.dot(self._alpha_for(mask), c[mask]))
 
 # ----------------------------------------------------------------------
     
@@ -50,15 +216,13 @@ class HPICalculator:
         Calculate Heavy Metal Evaluation Index (HEI)
         HEI = Σ(Ci/Si) / n
         """
-        sum_ratio = 0
-        count = 0
-        
-        for metal, concentration in sample_data.items():
-            if metal in self.standards and concentration is not None:
-                sum_ratio += concentration / self.standards[metal]
-                count += 1
+        c = self._concentrations(sample_data)
+        if _hei_kernel is not None:
+            return _hei_kernel(c, self._wi)
+        mask = ~np.isnan(c)
+        count = np.count_nonzero(mask)
         
-        return sum_ratio / count if count > 0 else 0
+        return float((c[mask] * self._wi[mask]).sum() / count) if count > 0 else 0
 
 # ----------------------------------------------------------------------
 
@@ -67,14 +231,13 @@ class HPICalculator:
         Calculate Degree of Contamination (Cd)
         Cd = Σ(Ci/Si - 1)
         """
-        cd_sum = 0
+        c = self._concentrations(sample_data)
+        if _cd_kernel is not None:
+            return _cd_kernel(c, self._wi)
+        mask = ~np.isnan(c)
+        cf = c[mask] * self._wi[mask]
         
-        for metal, concentration in sample_data.items():
-            if metal in self.standards and concentration is not None:
-                cf = concentration / self.standards[metal]
-                cd_sum += (cf - 1)
-        
-        return cd_sum
+        return float((cf - 1).sum())
 
 # ----------------------------------------------------------------------
 
@@ -85,45 +248,125 @@ class HPICalculator:
         """
         return self.calculate_hei(sample_data)  # Same formula as HEI
 
+# ----------------------------------------------------------------------
+
+    def calculate_all_indices(self, sample_data: Dict) -> Dict[str, float]:
+        """
+        Calculate HPI, HEI, Cd and MI in a single pass over the sample
+        Cd = Σ(Ci/Si) - n, the same sum HEI needs
+        """
+        get = sample_data.get
+        # None rather than NaN for missing metals: NaN != NaN would make every such key a cache miss
+        key = tuple(None if (c := get(m)) is None else float(c) for m in self._metals)
+        # Copy so callers can't mutate the cached dict
+        return dict(self._indices_for(key))
+
+    def _compute_all_indices(self, key: tuple) -> Dict[str, float]:
+        """calculate_all_indices body for a concentration tuple in self._metals order"""
+        c = np.array([np.nan if v is None else v for v in key], dtype=np.float64)
+        if _all_kernel is not None:
+            hpi, hei, cd = _all_kernel(c, self._wi)
+            return {"hpi": hpi, "hei": hei, "cd": cd, "mi": hei}
+        
+        mask = ~np.isnan(c)
+        count = np.count_nonzero(mask)
+        if count == 0:
+            return {"hpi": 0, "hei": 0, "cd": 0.0, "mi": 0}
+        
+        present = c[mask]
+        sum_ratio = float((present * self._wi[mask]).sum())
+        hei = sum_ratio / count
+        return {
+            "hpi": float(np.dot(self._alpha_for(mask), present)),
+            "hei": hei,
+            "cd": sum_ratio - count,
+            "mi": hei,  # Same formula as HEI
+        }
+
+    def indices_cache_info(self) -> Dict:
+        """Hit/miss statistics of the calculate_all_indices cache"""
+        return self._indices_for.cache_info()._asdict()
+
+# ----------------------------------------------------------------------
+
+    def sample_batch(self, samples: List[Dict]) -> SampleBatch:
+        """Stack sample dicts into a SampleBatch in this calculator's metal order, for the batch methods"""
+        return SampleBatch.from_samples(samples, self._metals)
+
+    def _batch_input(self, matrix: np.ndarray, mask: np.ndarray = None):
+        """
+        Normalizes batch input to (matrix, mask, 1/standards); mask defaults to ~isnan
+        float32 matrices stay float32 (half the memory traffic); anything else is computed as float64.
+        Non C-contiguous input (Fortran order, column slices) is copied once here.
+        A SampleBatch may be passed in place of matrix; its own mask is used.
+        """
+        if isinstance(matrix, SampleBatch):
+            matrix, mask = matrix.matrix, matrix.mask
+        matrix = np.asarray(matrix)
+        if matrix.dtype != np.float32:
+            matrix = matrix.astype(np.float64, copy=False)
+        matrix = np.ascontiguousarray(matrix)
+        recip_std = self._wi_f32 if matrix.dtype == np.float32 else self._wi
+        if mask is None:
+            mask = ~np.isnan(matrix)
+        return matrix, mask, recip_std
+
+    @staticmethod
+    def _masked_ratios(matrix: np.ndarray, mask: np.ndarray, recip_std: np.ndarray) -> np.ndarray:
+        """Ci/Si for every cell, zeroed where the metal is not present"""
+        return np.where(mask, matrix * recip_std, matrix.dtype.type(0))
+
+    def calculate_hpi_batch(self, matrix: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+        """HPI for every row of an (N × M) concentration matrix in self._metals order"""
+        matrix, mask, recip_std = self._batch_input(matrix, mask)
+        if mask.all():
+            # Every metal reported for every sample (the usual case): one matrix-vector product
+            return matrix @ self._alpha_full
+        ratios = self._masked_ratios(matrix, mask, recip_std)
+        w = np.where(mask, self._wi, 0.0)
+        total_weights = w.sum(axis=1)
+        total_weighted = (ratios * 100 * w).sum(axis=1)  # float64 weights, so float64 accumulation
+        return np.divide(total_weighted, total_weights, out=np.zeros_like(total_weighted), where=total_weights > 0)
+
+    def calculate_hei_batch(self, matrix: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+        """HEI (and MI) for every row of an (N × M) concentration matrix"""
+        matrix, mask, recip_std = self._batch_input(matrix, mask)
+        if mask.all():
+            return (matrix * recip_std).sum(axis=1, dtype=np.float64) / matrix.shape[1]
+        ratios = self._masked_ratios(matrix, mask, recip_std)
+        count = mask.sum(axis=1)
+        sum_ratio = ratios.sum(axis=1, dtype=np.float64)
+        return np.divide(sum_ratio, count, out=np.zeros_like(sum_ratio), where=count > 0)
+
+    def calculate_cd_batch(self, matrix: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+        """Cd for every row of an (N × M) concentration matrix"""
+        matrix, mask, recip_std = self._batch_input(matrix, mask)
+        if mask.all():
+            return (matrix * recip_std).sum(axis=1, dtype=np.float64) - matrix.shape[1]
+        ratios = self._masked_ratios(matrix, mask, recip_std)
+        return np.where(mask, ratios - 1, 0.0).sum(axis=1, dtype=np.float64)
+
 # ----------------------------------------------------------------------
 
     def categorize_water_quality(self, hpi_value: float) -> str:
         """Categorize water quality based on HPI value"""
-        if hpi_value < 25:
-            return "excellent"
-        elif hpi_value < 50:
-            return "good" 
-        elif hpi_value < 100:
-            return "moderate"
-        else:
-            return "poor"
+        return QUALITY_CATEGORIES[bisect.bisect_right(QUALITY_THRESHOLDS, hpi_value)]
     
     def classify_water_quality(self, hpi_value: float) -> str:
         """Alias for categorize_water_quality - classify water quality based on HPI value"""
         return self.categorize_water_quality(hpi_value)
 
-    def get_pollution_status(self, hpi_value: float) -> Dict:
+    def get_pollution_status(self, hpi_value: float) -> PollutionStatus:
         """
         Get detailed pollution status based on HPI
         """
         category = self.categorize_water_quality(hpi_value)
-        
-        if category == "excellent":
-            description = "Very low heavy metal pollution level"
-            risk_level = "Minimal"
-        elif category == "good":
-            description = "Low heavy metal pollution level"
-            risk_level = "Low"
-        elif category == "moderate":
-            description = "Moderate heavy metal pollution level"
-            risk_level = "Moderate"
-        else:  # poor
-            description = "High heavy metal pollution level"
-            risk_level = "High"
-        
-        return {
-            "hpi_value": round(hpi_value, 2),
-            "category": category,
-            "description": description,
-            "risk_level": risk_level
-        }
\ No newline at end of file
+        return _pollution_status(round(hpi_value, 2), category)
+
+# One calculator per process: __init__ builds the standards/weights arrays and the alpha cache
+# fills up over time, so every request should share the same instance
+_default_calculator = HPICalculator()
+
+def get_calculator() -> HPICalculator:
+    """FastAPI dependency returning the shared HPICalculator"""
+    return _default_calculator
@@ -0,0 +1,110 @@
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.services import hmpi_calculator
+from app.services.hmpi_calculator import HPICalculator
+
+KERNELS = ('_hpi_kernel', '_hei_kernel', '_cd_kernel', '_all_kernel')
+
+
+def reference_indices(sample: dict, standards: dict) -> dict:
+    """The original per-metal loop: metals that are missing or None are skipped"""
+    total_weighted = total_weights = sum_ratio = cd_sum = 0
+    count = 0
+    for metal, concentration in sample.items():
+        if metal in standards and concentration is not None:
+            wi = 1 / standards[metal]
+            ratio = concentration / standards[metal]
+            total_weighted += wi * ratio * 100
+            total_weights += wi
+            sum_ratio += ratio
+            cd_sum += ratio - 1
+            count += 1
+    hei = sum_ratio / count if count > 0 else 0
+    return {
+        "hpi": total_weighted / total_weights if total_weights > 0 else 0,
+        "hei": hei,
+        "cd": cd_sum,
+        "mi": hei,
+    }
+
+
+def random_samples(standards: dict, n: int = 300, seed: int = 1234) -> list:
+    """Samples with each metal present, None or absent, plus the all-present and all-missing edge cases"""
+    rng = random.Random(seed)
+    samples = [{metal: standard * 0.5 for metal, standard in standards.items()}, {}, {metal: None for metal in standards}]
+    for _ in range(n):
+        sample = {'sample_id': 'S'}  # keys that are not metals are ignored
+        for metal, standard in standards.items():
+            roll = rng.random()
+            if roll < 0.6:
+                sample[metal] = rng.uniform(0.0, 3.0) * standard
+            elif roll < 0.8:
+                sample[metal] = None
+        samples.append(sample)
+    return samples
+
+
+class CalculatorParityMixin:
+    """HPICalculator against reference_indices; subclasses pick the numba or NumPy code path"""
+
+    def setUp(self):
+        self.calculator = HPICalculator()
+        self.samples = random_samples(self.calculator.standards)
+        self.expected = [reference_indices(s, self.calculator.standards) for s in self.samples]
+
+    def test_single_sample_methods(self):
+        for sample, expected in zip(self.samples, self.expected):
+            with self.subTest(sample=sample):
+                self.assertAlmostEqual(self.calculator.calculate_hpi(sample), expected["hpi"], places=9)
+                self.assertAlmostEqual(self.calculator.calculate_hei(sample), expected["hei"], places=9)
+                self.assertAlmostEqual(self.calculator.calculate_cd(sample), expected["cd"], places=9)
+                self.assertAlmostEqual(self.calculator.calculate_mi(sample), expected["mi"], places=9)
+
+    def test_calculate_all_indices(self):
+        # Twice, so the second pass is served from the indices cache
+        for _ in range(2):
+            for sample, expected in zip(self.samples, self.expected):
+                result = self.calculator.calculate_all_indices(sample)
+                for key in ("hpi", "hei", "cd", "mi"):
+                    self.assertAlmostEqual(result[key], expected[key], places=9, msg=f"{key} for {sample}")
+
+    def test_batch_methods(self):
+        batch = self.calculator.sample_batch(self.samples)
+        for key, method in (("hpi", self.calculator.calculate_hpi_batch),
+                            ("hei", self.calculator.calculate_hei_batch),
+                            ("cd", self.calculator.calculate_cd_batch)):
+            expected = np.array([e[key] for e in self.expected])
+            with self.subTest(index=key):
+                np.testing.assert_allclose(method(batch), expected, rtol=1e-9, atol=1e-9)
+                # A plain NaN matrix derives the same mask as the SampleBatch carries
+                np.testing.assert_allclose(method(batch.matrix), expected, rtol=1e-9, atol=1e-9)
+
+    def test_batch_without_missing_metals(self):
+        samples = [s for s in self.samples if all(s.get(m) is not None for m in self.calculator.standards)]
+        samples += [{m: v * 2 for m, v in self.calculator.standards.items()}]
+        matrix = self.calculator.sample_batch(samples).matrix
+        expected = [reference_indices(s, self.calculator.standards) for s in samples]
+        np.testing.assert_allclose(self.calculator.calculate_hpi_batch(matrix), [e["hpi"] for e in expected], rtol=1e-9)
+        np.testing.assert_allclose(self.calculator.calculate_hei_batch(matrix), [e["hei"] for e in expected], rtol=1e-9)
+        np.testing.assert_allclose(self.calculator.calculate_cd_batch(matrix), [e["cd"] for e in expected], rtol=1e-9)
+
+
+@unittest.skipIf(hmpi_calculator._all_kernel is None, "numba is not installed")
+class NumbaCalculatorParityTest(CalculatorParityMixin, unittest.TestCase):
+    pass
+
+
+class NumpyCalculatorParityTest(CalculatorParityMixin, unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(hmpi_calculator, **{name: None for name in KERNELS})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+if __name__ == '__main__':
+    unittest.main()